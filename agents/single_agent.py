@@ -1,4 +1,4 @@
-from typing import Any, Dict, List, Optional, TypedDict
+from typing import Any, Dict, List, Optional, Tuple, TypedDict
 
 try:
     from langgraph.graph import END, START, StateGraph
@@ -46,7 +46,7 @@ except ModuleNotFoundError:
         def compile(self):
             return _CompiledStateGraph(self.nodes, self.edges, self.conditional_edges)
 
-from utils.document_processor import DocumentProcessor
+from utils.document_processor import get_document_processor
 from utils.qwen_client import QwenClient
 from utils.vector_store import RetrievalStrategy
 
@@ -63,7 +63,7 @@ DOCUMENT_REQUIRED_TOOLS = SUPPORTED_TOOLS
 
 class AgentState(TypedDict, total=False):
     user_input: str
-    current_file_path: str
+    current_file_paths: List[str]
     has_document: bool
     intent: str
     tool_name: str
@@ -85,12 +85,15 @@ class CtrlPassAgent:
         qa_chain: Any,
         exercise_generator: Any,
         knowledge_mapper: Any,
+        document_cache: Optional[Dict[str, List[Any]]] = None,
     ):
         self.vector_store_manager = vector_store_manager
         self.qa_chain = qa_chain
         self.exercise_generator = exercise_generator
         self.knowledge_mapper = knowledge_mapper
-        self.document_processor = DocumentProcessor()
+        self.document_processor = get_document_processor()
+        self.document_cache = document_cache if document_cache is not None else {}
+        self._content_cache: Dict[Tuple[str, ...], str] = {}
         self.qwen_client = QwenClient(qwen_api_key)
         self.graph = self._build_graph()
 
@@ -132,11 +135,11 @@ class CtrlPassAgent:
         workflow.add_edge("finalize", END)
         return workflow.compile()
 
-    def run(self, user_input: str, current_file_path: Optional[str]) -> Dict[str, Any]:
+    def run(self, user_input: str, current_file_paths: Optional[List[str]]) -> Dict[str, Any]:
         result = self.graph.invoke(
             {
                 "user_input": user_input,
-                "current_file_path": current_file_path or "",
+                "current_file_paths": list(current_file_paths or []),
             },
         )
         return {
@@ -149,12 +152,14 @@ class CtrlPassAgent:
         }
 
     def _initialize(self, state: AgentState) -> AgentState:
-        current_file_path = state.get("current_file_path", "")
+        current_file_paths = state.get("current_file_paths", [])
         return {
-            "has_document": bool(current_file_path),
+            "has_document": bool(current_file_paths),
             "messages": [
                 "Initialized agent workflow.",
-                "Uploaded document detected." if current_file_path else "No uploaded document detected.",
+                f"{len(current_file_paths)} uploaded document(s) detected."
+                if current_file_paths
+                else "No uploaded document detected.",
             ],
         }
 
@@ -248,7 +253,7 @@ User request: {user_input}
         messages = list(state.get("messages", []))
 
         if tool_name in {"generate_exercises", "generate_knowledge_map"}:
-            content = self._load_document_content(state.get("current_file_path", ""))
+            content = self._load_document_content(state.get("current_file_paths", []))
             messages.append("Loaded full document content for downstream tool execution.")
             return {
                 "tool_input": tool_input,
@@ -406,17 +411,28 @@ User request: {user_input}
             "messages": state.get("messages", []),
         }
 
-    def _load_document_content(self, file_path: str) -> str:
-        if not file_path:
+    def _load_document_content(self, file_paths: List[str]) -> str:
+        if not file_paths:
             raise ValueError("No uploaded document is available for this tool.")
 
-        documents = self.document_processor.load_document(file_path)
-        if not documents:
-            raise ValueError("Failed to load the uploaded document.")
-
-        content = "\n".join(doc.page_content for doc in documents)
+        cache_key = tuple(file_paths)
+        if cache_key in self._content_cache:
+            return self._content_cache[cache_key]
+
+        all_content = []
+        for file_path in file_paths:
+            documents = self.document_cache.get(file_path)
+            if documents is None:
+                documents = self.document_processor.load_document(file_path)
+                self.document_cache[file_path] = documents
+            if not documents:
+                raise ValueError(f"Failed to load the uploaded document: {file_path}")
+            all_content.append("\n".join(doc.page_content for doc in documents))
+
+        content = "\n\n".join(all_content)
         if not content.strip():
             raise ValueError("The uploaded document is empty.")
+        self._content_cache[cache_key] = content
         return content
 
     @staticmethod
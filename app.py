@@ -1,19 +1,26 @@
+import hashlib
 import os
+import re
+import shutil
 import tempfile
 import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import streamlit as st
 from dotenv import load_dotenv
 
 from agents import CtrlPassAgent
-from utils.document_processor import DocumentProcessor
-from utils.exercise_generator import ExerciseGenerator
+from utils.document_processor import DocumentProcessor, get_document_processor
+from utils.exercise_generator import get_exercise_generator
 from utils.knowledge_mapper import KnowledgeMapper
 from utils.qa_chain import QAChain
 from utils.vector_store import VectorStoreManager
 
 load_dotenv()
 
+MAX_INGEST_WORKERS = 8
+UPLOAD_COPY_BUFFER_SIZE = 64 * 1024
+
 st.set_page_config(
     page_title="CtrlPass",
     page_icon="CP",
@@ -29,7 +36,8 @@ def ensure_session_state() -> None:
         "knowledge_mapper": None,
         "agent": None,
         "processed_docs": False,
-        "current_file_path": None,
+        "processed_files": [],
+        "loaded_docs": {},
         "chat_history": [],
         "agent_api_key": "",
     }
@@ -54,6 +62,7 @@ def build_agent(api_key: str) -> None:
         qa_chain=st.session_state.qa_chain,
         exercise_generator=st.session_state.exercise_generator,
         knowledge_mapper=st.session_state.knowledge_mapper,
+        document_cache=st.session_state.loaded_docs,
     )
     st.session_state.agent_api_key = api_key
 
@@ -63,26 +72,70 @@ def save_uploaded_file(uploaded_file) -> str:
     os.makedirs("data", exist_ok=True)
     file_name, file_ext = os.path.splitext(uploaded_file.name)
     file_path = os.path.join("data", f"{file_name}_{session_id}{file_ext}")
+    uploaded_file.seek(0)
     with open(file_path, "wb") as file_handle:
-        file_handle.write(uploaded_file.getbuffer())
+        shutil.copyfileobj(uploaded_file, file_handle, UPLOAD_COPY_BUFFER_SIZE)
     return file_path
 
 
-def process_document(uploaded_file, api_key: str, chunk_size: int, chunk_overlap: int, use_model_splitter: bool) -> None:
-    with st.spinner("Processing document..."):
-        file_path = save_uploaded_file(uploaded_file)
-        doc_processor = DocumentProcessor(
+def load_and_split(uploaded_file, doc_processor: DocumentProcessor):
+    file_path = save_uploaded_file(uploaded_file)
+    documents = doc_processor.load_document(file_path)
+    chunks = doc_processor.split_documents(documents)
+    return file_path, documents, chunks
+
+
+def dedupe_chunks(chunks):
+    """Drop chunks whose whitespace-normalized text was already seen."""
+    seen = set()
+    unique_chunks = []
+    for chunk in chunks:
+        normalized = re.sub(r"\s+", " ", chunk.page_content).strip()
+        digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+        if digest not in seen:
+            seen.add(digest)
+            unique_chunks.append(chunk)
+    return unique_chunks, len(chunks) - len(unique_chunks)
+
+
+def process_documents(uploaded_files, api_key: str, chunk_size: int, chunk_overlap: int, use_model_splitter: bool) -> None:
+    with st.spinner("Processing documents..."):
+        doc_processor = get_document_processor(
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
             use_model_splitter=use_model_splitter,
         )
-        documents = doc_processor.load_document(file_path)
-        chunks = doc_processor.split_documents(documents)
+
+        # Files are independent, so save/load/split them concurrently.
+        results = {}
+        max_workers = min(MAX_INGEST_WORKERS, len(uploaded_files))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(load_and_split, uploaded_file, doc_processor): index
+                for index, uploaded_file in enumerate(uploaded_files)
+            }
+            for future in as_completed(futures):
+                index = futures[future]
+                results[index] = future.result()
+                st.info(f"Loaded {uploaded_files[index].name} ({len(results[index][2])} chunks).")
+
+        file_paths = []
+        loaded_docs = {}
+        all_chunks = []
+        for index in range(len(uploaded_files)):
+            file_path, documents, chunks = results[index]
+            file_paths.append(file_path)
+            loaded_docs[file_path] = documents
+            all_chunks.extend(chunks)
+
+        all_chunks, duplicates_removed = dedupe_chunks(all_chunks)
+        if duplicates_removed:
+            st.info(f"Skipped {duplicates_removed} duplicate chunks.")
 
         vector_store_manager = VectorStoreManager(api_key)
-        vector_store_manager.create_vector_store(chunks, os.path.splitext(os.path.basename(file_path))[0].split("_")[-1])
+        vector_store_manager.create_vector_store(all_chunks, str(uuid.uuid4()))
         qa_chain = QAChain(api_key, vector_store_manager)
-        exercise_generator = ExerciseGenerator(api_key)
+        exercise_generator = get_exercise_generator(api_key)
         knowledge_mapper = KnowledgeMapper(api_key)
 
         st.session_state.vector_store_manager = vector_store_manager
@@ -90,11 +143,15 @@ def process_document(uploaded_file, api_key: str, chunk_size: int, chunk_overlap
         st.session_state.exercise_generator = exercise_generator
         st.session_state.knowledge_mapper = knowledge_mapper
         st.session_state.processed_docs = True
-        st.session_state.current_file_path = file_path
+        st.session_state.processed_files = file_paths
+        # Keep parsed documents so the agent does not re-parse them for every tool call.
+        st.session_state.loaded_docs = loaded_docs
         st.session_state.chat_history = []
 
         build_agent(api_key)
-        st.success(f"Document processed into {len(chunks)} chunks. Agent mode is ready.")
+        st.success(
+            f"{len(file_paths)} document(s) processed into {len(all_chunks)} chunks. Agent mode is ready."
+        )
 
 
 def render_mindmap(mindmap_data) -> None:
@@ -155,7 +212,11 @@ with st.sidebar:
     st.title("Configuration")
     env_api_key = os.getenv("DASHSCOPE_API_KEY") or os.getenv("QWEN_API_KEY") or ""
     api_key = st.text_input("Qwen API Key", type="password", value=env_api_key)
-    uploaded_file = st.file_uploader("Upload document", type=["txt", "pdf", "docx"])
+    uploaded_files = st.file_uploader(
+        "Upload documents",
+        type=["txt", "pdf", "docx"],
+        accept_multiple_files=True,
+    )
     st.subheader("Chunk settings")
     use_model_splitter = st.checkbox(
         "Use model-based splitter",
@@ -164,17 +225,17 @@ with st.sidebar:
     )
     chunk_size = st.slider("Chunk size", 100, 2000, 500)
     chunk_overlap = st.slider("Chunk overlap", 0, 500, 100)
-    process_button = st.button("Process document")
+    process_button = st.button("Process documents")
 
     if process_button:
-        if not uploaded_file:
+        if not uploaded_files:
             st.warning("Upload a document first.")
         elif not api_key:
             st.warning("Enter a valid API key first.")
         else:
             try:
-                process_document(
-                    uploaded_file,
+                process_documents(
+                    uploaded_files,
                     api_key,
                     chunk_size,
                     chunk_overlap,
@@ -191,8 +252,9 @@ if st.session_state.processed_docs and api_key and (
 ):
     build_agent(api_key)
 
-if st.session_state.current_file_path:
-    st.caption(f"Current document: `{os.path.basename(st.session_state.current_file_path)}`")
+if st.session_state.processed_files:
+    file_names = ", ".join(f"`{os.path.basename(path)}`" for path in st.session_state.processed_files)
+    st.caption(f"Current documents: {file_names}")
 
 for entry in st.session_state.chat_history:
     with st.chat_message("user"):
@@ -219,7 +281,7 @@ if prompt:
             with st.spinner("Agent is thinking..."):
                 result = st.session_state.agent.run(
                     prompt,
-                    st.session_state.current_file_path,
+                    st.session_state.processed_files,
                 )
                 render_agent_result(result)
 
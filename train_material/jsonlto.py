@@ -1,11 +1,17 @@
 import json
 
+import orjson
+
+# 每累计这么多行写一次文件
+BATCH_SIZE = 10000
+
 # 读取原始JSON文件
 with open('intents.json', 'r', encoding='utf-8') as f:
     data = json.load(f)
 
-# 转换为ChatML格式的JSONL
-with open('outputml.jsonl', 'w', encoding='utf-8') as f_out:
+# 转换为ChatML格式的JSONL，分批写入以控制内存占用
+with open('outputml.jsonl', 'wb') as f_out:
+    buffer = []
     for intent in data["intents"]:
         for pattern in intent["patterns"]:
             # 构造单轮对话
@@ -13,4 +19,8 @@ with open('outputml.jsonl', 'w', encoding='utf-8') as f_out:
                 {"role": "user", "content": pattern},
                 {"role": "assistant", "content": intent["responses"][0]}  # 取第一个回答
             ]
-            f_out.write(json.dumps({"messages": messages}, ensure_ascii=False) + '\n')
\ No newline at end of file
+            buffer.append(orjson.dumps({"messages": messages}) + b"\n")
+            if len(buffer) >= BATCH_SIZE:
+                f_out.writelines(buffer)
+                buffer.clear()
+    f_out.writelines(buffer)
@@ -1,23 +1,34 @@
-import json
 import os
-from typing import List, Dict
+from dataclasses import dataclass
+from typing import List, Dict, Tuple
 from datetime import datetime
 
+import orjson
+
+@dataclass(slots=True)
+class QAPair:
+    context: str
+    question: str
+    answer: str
+    timestamp: str
+
 class TrainingDataCollector:
     def __init__(self, data_dir: str = "training_data"):
         self.data_dir = data_dir
         os.makedirs(data_dir, exist_ok=True)
-        self.qa_pairs: List[Dict[str, str]] = []
+        self.qa_pairs: List[QAPair] = []
         
     def add_qa_pair(self, context: str, question: str, answer: str):
         """添加一个问答对到训练数据中"""
-        qa_pair = {
-            "context": context,
-            "question": question,
-            "answer": answer,
-            "timestamp": datetime.now().isoformat()
-        }
-        self.qa_pairs.append(qa_pair)
+        self.qa_pairs.append(QAPair(context, question, answer, datetime.now().isoformat()))
+        
+    def add_qa_pairs(self, pairs: List[Tuple[str, str, str]]):
+        """批量添加问答对，同一批次共用一个时间戳"""
+        timestamp = datetime.now().isoformat()
+        self.qa_pairs.extend(
+            QAPair(context, question, answer, timestamp)
+            for context, question, answer in pairs
+        )
         
     def save_data(self, filename: str = None):
         """保存训练数据到文件"""
@@ -25,22 +36,39 @@ class TrainingDataCollector:
             filename = f"training_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
         
         file_path = os.path.join(self.data_dir, filename)
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(self.qa_pairs, f, ensure_ascii=False, indent=2)
+        # orjson直接序列化dataclass，输出UTF-8且不转义中文
+        with open(file_path, 'wb') as f:
+            f.write(orjson.dumps(self.qa_pairs, option=orjson.OPT_INDENT_2))
         print(f"训练数据已保存到: {file_path}")
         
-    def load_data(self, filename: str) -> List[Dict[str, str]]:
+    def load_data(self, filename: str) -> List[QAPair]:
         """从文件加载训练数据"""
         file_path = os.path.join(self.data_dir, filename)
-        with open(file_path, 'r', encoding='utf-8') as f:
-            self.qa_pairs = json.load(f)
+        with open(file_path, 'rb') as f:
+            self.qa_pairs = [QAPair(**item) for item in orjson.loads(f.read())]
         return self.qa_pairs
     
     def get_statistics(self) -> Dict:
         """获取训练数据统计信息"""
+        total = len(self.qa_pairs)
+        if not total:
+            return {
+                "total_pairs": 0,
+                "avg_context_length": 0,
+                "avg_question_length": 0,
+                "avg_answer_length": 0
+            }
+        
+        # 单次遍历同时累计三类长度
+        context_length = question_length = answer_length = 0
+        for qa in self.qa_pairs:
+            context_length += len(qa.context)
+            question_length += len(qa.question)
+            answer_length += len(qa.answer)
+        
         return {
-            "total_pairs": len(self.qa_pairs),
-            "avg_context_length": sum(len(qa["context"]) for qa in self.qa_pairs) / len(self.qa_pairs) if self.qa_pairs else 0,
-            "avg_question_length": sum(len(qa["question"]) for qa in self.qa_pairs) / len(self.qa_pairs) if self.qa_pairs else 0,
-            "avg_answer_length": sum(len(qa["answer"]) for qa in self.qa_pairs) / len(self.qa_pairs) if self.qa_pairs else 0
+            "total_pairs": total,
+            "avg_context_length": context_length / total,
+            "avg_question_length": question_length / total,
+            "avg_answer_length": answer_length / total
         } 
\ No newline at end of file
@@ -1,15 +1,55 @@
+import functools
+import mmap
 import os
 import re
+import threading
 from dataclasses import dataclass
-from typing import List
+from typing import Any, Dict, List, Tuple
 
 import numpy as np
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import Docx2txtLoader, PyPDFLoader, TextLoader
+from langchain_community.document_loaders import Docx2txtLoader, PyPDFLoader
+from langchain_core.documents import Document
+
+from utils.fast_splitter import FAST_SPLIT_MIN_CHARS, FastTextSplitter
 
 SENTENCE_SEPARATORS = ["。", "；", "！", "？", ".", "!", "?", "\n"]
 TEXT_SPLITTER_SEPARATORS = ["\n\n", "\n", "。", "；", "！", "？", ".", "!", "?", " ", ""]
 SENTENCE_BOUNDARY_PATTERN = r"(?<=[。；！？.!?\n])"
+LARGE_TEXT_FILE_BYTES = 5_000_000
+# Tried in order with strict decoding; GB18030 covers GBK/CP936 files saved by Chinese Windows.
+TEXT_FILE_ENCODINGS = ("utf-8", "gb18030")
+
+# Processors are cached per splitter setting; the sentence model is shared per model name
+# so changing chunk size or overlap does not load another copy of the weights.
+_SENTENCE_MODELS: Dict[str, Tuple[Any, threading.Lock]] = {}
+_SENTENCE_MODELS_LOCK = threading.Lock()
+
+
+def _get_shared_sentence_model(model_name: str) -> Tuple[Any, threading.Lock]:
+    """Return the process-wide SentenceTransformer for model_name and the lock guarding its encodes."""
+    with _SENTENCE_MODELS_LOCK:
+        shared = _SENTENCE_MODELS.get(model_name)
+        if shared is not None:
+            return shared
+
+        try:
+            from sentence_transformers import SentenceTransformer
+        except Exception as exc:
+            raise RuntimeError(
+                "Model-based splitting requires sentence-transformers and a working torch installation."
+            ) from exc
+
+        try:
+            model = SentenceTransformer(model_name)
+        except Exception as exc:
+            raise RuntimeError(
+                "Failed to initialize the model-based splitter. Please check the local torch/runtime installation."
+            ) from exc
+
+        shared = (model, threading.Lock())
+        _SENTENCE_MODELS[model_name] = shared
+        return shared
 
 
 @dataclass
@@ -29,19 +69,9 @@ class ModelBasedTextSplitter:
         similarity_threshold: float = 0.7,
         min_chunk_size: int = 100,
     ):
-        try:
-            from sentence_transformers import SentenceTransformer
-        except Exception as exc:
-            raise RuntimeError(
-                "Model-based splitting requires sentence-transformers and a working torch installation."
-            ) from exc
-
-        try:
-            self.model = SentenceTransformer(model_name)
-        except Exception as exc:
-            raise RuntimeError(
-                "Failed to initialize the model-based splitter. Please check the local torch/runtime installation."
-            ) from exc
+        # Uploads are split on a thread pool; torch already uses every core per encode
+        # and the fast tokenizer is not safe for concurrent use, so encodes run one at a time.
+        self.model, self._encode_lock = _get_shared_sentence_model(model_name)
 
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
@@ -49,7 +79,8 @@ class ModelBasedTextSplitter:
         self.min_chunk_size = min_chunk_size
 
     def _get_sentence_embeddings(self, sentences: List[str]) -> np.ndarray:
-        return self.model.encode(sentences, show_progress_bar=False)
+        with self._encode_lock:
+            return self.model.encode(sentences, show_progress_bar=False)
 
     def _calculate_similarity(self, emb1: np.ndarray, emb2: np.ndarray) -> float:
         return float(np.dot(emb1, emb2) / (np.linalg.norm(emb1) * np.linalg.norm(emb2)))
@@ -145,12 +176,17 @@ class DocumentProcessor:
                 separators=TEXT_SPLITTER_SEPARATORS,
                 keep_separator=True,
             )
+            self.fast_splitter = FastTextSplitter(
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+                separators=TEXT_SPLITTER_SEPARATORS,
+            )
 
     def load_document(self, file_path: str) -> List[str]:
         file_extension = os.path.splitext(file_path)[1].lower()
 
         if file_extension == ".txt":
-            loader = TextLoader(file_path)
+            return self._load_text(file_path)
         elif file_extension == ".pdf":
             loader = PyPDFLoader(file_path)
         elif file_extension == ".docx":
@@ -160,6 +196,27 @@ class DocumentProcessor:
 
         return loader.load()
 
+    def _load_text(self, file_path: str) -> List[Document]:
+        """Decode a text file with the same encoding policy regardless of size; large files are read through a memory map."""
+        with open(file_path, "rb") as file_handle:
+            if os.fstat(file_handle.fileno()).st_size > LARGE_TEXT_FILE_BYTES:
+                with mmap.mmap(file_handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    text = self._decode_text(mapped, file_path)
+            else:
+                text = self._decode_text(file_handle.read(), file_path)
+        return [Document(page_content=text, metadata={"source": file_path})]
+
+    @staticmethod
+    def _decode_text(data, file_path: str) -> str:
+        for encoding in TEXT_FILE_ENCODINGS:
+            try:
+                return str(data, encoding)
+            except UnicodeDecodeError:
+                continue
+        raise RuntimeError(
+            f"Error loading {file_path}: not valid text in any of {', '.join(TEXT_FILE_ENCODINGS)}"
+        )
+
     def split_documents(self, documents: List[str]) -> List[str]:
         """Split documents into smaller chunks."""
         if self.use_model_splitter:
@@ -174,4 +231,25 @@ class DocumentProcessor:
                     all_chunks.append(new_doc)
             return all_chunks
 
-        return self.text_splitter.split_documents(documents)
+        # Large documents go through the single-pass splitter; small ones keep the langchain splitter.
+        all_chunks = []
+        for doc in documents:
+            if len(doc.page_content) >= FAST_SPLIT_MIN_CHARS:
+                all_chunks.extend(self.fast_splitter.split_documents([doc]))
+            else:
+                all_chunks.extend(self.text_splitter.split_documents([doc]))
+        return all_chunks
+
+
+@functools.lru_cache(maxsize=8)
+def get_document_processor(
+    chunk_size: int = 500,
+    chunk_overlap: int = 100,
+    use_model_splitter: bool = False,
+) -> DocumentProcessor:
+    """Return a shared processor so splitters are built once per setting; the sentence model is shared across settings."""
+    return DocumentProcessor(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        use_model_splitter=use_model_splitter,
+    )
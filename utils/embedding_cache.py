@@ -0,0 +1,85 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_CACHE_PATH = os.path.join("data", "embedding_cache.sqlite3")
+
+# SQLite limits the number of bound parameters per statement.
+_LOOKUP_BATCH_SIZE = 500
+
+
+class EmbeddingCache:
+    """Persistent chunk embedding cache keyed by (sha256(text), model)."""
+
+    def __init__(self, db_path: str = DEFAULT_CACHE_PATH):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS embedding_cache ("
+            "hash TEXT NOT NULL, "
+            "model TEXT NOT NULL, "
+            "vec BLOB NOT NULL, "
+            "PRIMARY KEY (hash, model))"
+        )
+        self._connection.commit()
+
+    @staticmethod
+    def hash_text(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, hashes: Iterable[str], model: str) -> Dict[str, np.ndarray]:
+        hashes = list(hashes)
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            for start in range(0, len(hashes), _LOOKUP_BATCH_SIZE):
+                batch = hashes[start:start + _LOOKUP_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._connection.execute(
+                    f"SELECT hash, vec FROM embedding_cache WHERE model = ? AND hash IN ({placeholders})",
+                    [model, *batch],
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, items: Sequence[Tuple[str, Sequence[float]]], model: str) -> None:
+        rows = [
+            (text_hash, model, np.asarray(vector, dtype=np.float32).tobytes())
+            for text_hash, vector in items
+        ]
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO embedding_cache (hash, model, vec) VALUES (?, ?, ?)",
+                rows,
+            )
+            self._connection.commit()
+
+    def embed_documents(self, embeddings: Any, texts: List[str], model: str) -> List[List[float]]:
+        """Embed texts, calling the provider only for chunks not seen before."""
+        hashes = [self.hash_text(text) for text in texts]
+        vectors = self.get_many(set(hashes), model)
+
+        missing: Dict[str, str] = {}
+        for text_hash, text in zip(hashes, texts):
+            if text_hash not in vectors and text_hash not in missing:
+                missing[text_hash] = text
+
+        if missing:
+            new_vectors = embeddings.embed_documents(list(missing.values()))
+            new_items = list(zip(missing.keys(), new_vectors))
+            self.put_many(new_items, model)
+            for text_hash, vector in new_items:
+                vectors[text_hash] = np.asarray(vector, dtype=np.float32)
+
+        hits = sum(1 for text_hash in hashes if text_hash not in missing)
+        print(f"Embedding cache: {hits} hits, {len(texts) - hits} misses")
+        return [vectors[text_hash].tolist() for text_hash in hashes]
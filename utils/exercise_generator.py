@@ -1,17 +1,195 @@
-from dashscope import Generation
-from typing import List, Dict
+from dashscope import Generation, TextEmbedding
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Optional
+import functools
+import hashlib
 import json
 import logging
+import os
+import tempfile
+import threading
+import numpy as np
+import orjson
 import streamlit as st
 
+# 语义缓存只用于能整篇向量化的短文档：只比较前缀会把“A”和“A+B”当成同一份资料
+SEMANTIC_CACHE_MAX_CHARS = 3000
+SEMANTIC_CACHE_THRESHOLD = 0.95
+# 两份文档长度之比低于该值时不视为同一份资料
+SEMANTIC_CACHE_MIN_LENGTH_RATIO = 0.9
+# 缓存条目上限，超出后淘汰最久未使用的条目，缓存文件和每次保存的开销因此有上界
+EXERCISE_CACHE_MAX_ENTRIES = 256
+
+# 长文档按段并行出题：单段字符数上限与最大并发段数
+SEGMENT_CHARS = 6000
+MAX_SEGMENTS = 5
+
+# 日志只需配置一次
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class _ExerciseCache:
+    """练习题缓存：内容哈希 -> 练习题列表，短文档另存整篇向量和长度用于语义匹配
+
+    同一缓存文件只对应一个实例，由所有生成器和会话线程共享，读写都要持锁
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self.cache_path = os.path.join(cache_dir, "exercises.json")
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, List[Dict]]" = OrderedDict()
+        self._embeddings: Dict[str, List[float]] = {}
+        self._lengths: Dict[str, int] = {}
+        self._keys: List[str] = []
+        self._matrix: Optional[np.ndarray] = None
+        self._length_array: Optional[np.ndarray] = None
+        self._load()
+
+    def get(self, content_hash: str) -> Optional[List[Dict]]:
+        with self._lock:
+            cached = self._entries.get(content_hash)
+            if cached is not None:
+                self._entries.move_to_end(content_hash)
+            return cached
+
+    def semantic_lookup(self, embedding: Optional[np.ndarray], content_length: int) -> Optional[List[Dict]]:
+        """在长度相近的已缓存向量中查找最相似的一条，相似度超过阈值才返回"""
+        if embedding is None:
+            return None
+        with self._lock:
+            if self._matrix is None or self._matrix.shape[1] != embedding.shape[0]:
+                return None
+            
+            lengths = self._length_array
+            length_ratio = np.minimum(lengths, content_length) / np.maximum(lengths, content_length)
+            similarities = np.einsum('ij,j->i', self._matrix, embedding)
+            similarities[length_ratio < SEMANTIC_CACHE_MIN_LENGTH_RATIO] = -1.0
+            best = int(np.argmax(similarities))
+            if similarities[best] < SEMANTIC_CACHE_THRESHOLD:
+                return None
+            logger.info(f"语义缓存相似度: {similarities[best]:.4f}")
+            self._entries.move_to_end(self._keys[best])
+            return self._entries[self._keys[best]]
+
+    def store(self, content_hash: str, embedding: Optional[np.ndarray], content_length: int, exercises: List[Dict]):
+        """写入缓存并持久化"""
+        with self._lock:
+            self._entries[content_hash] = exercises
+            self._entries.move_to_end(content_hash)
+            if embedding is not None:
+                self._embeddings[content_hash] = embedding.tolist()
+                self._lengths[content_hash] = content_length
+            evicted = self._evict()
+            if embedding is not None or evicted:
+                self._rebuild_matrix()
+            self._save()
+
+    def _evict(self) -> bool:
+        """淘汰最久未使用的条目直到不超过上限（调用方需持有缓存锁）"""
+        evicted = False
+        while len(self._entries) > EXERCISE_CACHE_MAX_ENTRIES:
+            content_hash, _ = self._entries.popitem(last=False)
+            self._embeddings.pop(content_hash, None)
+            self._lengths.pop(content_hash, None)
+            evicted = True
+        return evicted
+
+    def _rebuild_matrix(self):
+        """把缓存向量整理成 (N, D) 矩阵，便于一次性计算相似度（调用方需持有缓存锁）"""
+        self._keys = list(self._embeddings.keys())
+        if self._keys:
+            self._matrix = np.asarray(
+                [self._embeddings[key] for key in self._keys],
+                dtype=np.float32
+            )
+            self._length_array = np.asarray(
+                [max(self._lengths[key], 1) for key in self._keys],
+                dtype=np.float64
+            )
+        else:
+            self._matrix = None
+            self._length_array = None
+
+    def _load(self):
+        """从磁盘加载练习题缓存"""
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"加载练习题缓存失败: {str(e)}")
+            return
+        
+        if not isinstance(entries, dict):
+            logger.warning("练习题缓存格式不正确，已忽略")
+            return
+        
+        with self._lock:
+            for content_hash, entry in entries.items():
+                if not isinstance(entry, dict) or not isinstance(entry.get("exercises"), list):
+                    logger.warning(f"跳过格式不正确的练习题缓存条目: {content_hash}")
+                    continue
+                self._entries[content_hash] = entry["exercises"]
+                # 没有记录长度的旧条目可能是长文档的前缀向量，不参与语义匹配
+                if entry.get("embedding") and isinstance(entry.get("length"), int):
+                    self._embeddings[content_hash] = entry["embedding"]
+                    self._lengths[content_hash] = entry["length"]
+            # 文件按最近使用顺序保存，旧文件超出上限时只保留最近的条目
+            self._evict()
+            self._rebuild_matrix()
+
+    def _save(self):
+        """按最近使用顺序保存练习题缓存到磁盘（调用方需持有缓存锁）"""
+        entries = {
+            content_hash: {
+                "exercises": exercises,
+                "embedding": self._embeddings.get(content_hash),
+                "length": self._lengths.get(content_hash)
+            }
+            for content_hash, exercises in self._entries.items()
+        }
+        temp_path = None
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # 先写临时文件再原子替换，崩溃时不会留下写了一半的缓存文件
+            fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entries, f, ensure_ascii=False)
+            os.replace(temp_path, self.cache_path)
+        except OSError as e:
+            logger.warning(f"保存练习题缓存失败: {str(e)}")
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+_EXERCISE_CACHES: Dict[str, _ExerciseCache] = {}
+_EXERCISE_CACHES_LOCK = threading.Lock()
+
+
+def _get_exercise_cache(cache_dir: str) -> _ExerciseCache:
+    """按缓存目录返回唯一的缓存实例，避免多个实例互相覆盖同一个缓存文件"""
+    cache_dir = os.path.abspath(cache_dir)
+    with _EXERCISE_CACHES_LOCK:
+        cache = _EXERCISE_CACHES.get(cache_dir)
+        if cache is None:
+            cache = _ExerciseCache(cache_dir)
+            _EXERCISE_CACHES[cache_dir] = cache
+        return cache
+
+
 class ExerciseGenerator:
-    def __init__(self, dashscope_api_key: str):
+    def __init__(self, dashscope_api_key: str, cache_dir: str = os.path.join("data", "exercise_cache")):
         self.api_key = dashscope_api_key
         self.model = "qwen-max"  # 使用通义千问大模型
+        self.embedding_model = "text-embedding-v2"
         
-        # 设置日志
-        logging.basicConfig(level=logging.INFO)
-        self.logger = logging.getLogger(__name__)
+        self.logger = logger
+        
+        # 练习题缓存按目录在所有生成器之间共享
+        self.cache = _get_exercise_cache(cache_dir)
         
         self.exercise_template = """假如你是出题者，模仿以下学习资料的出题风格和考察知识点，生成3道练习题。每道题应该包含：
         1. 题目描述
@@ -35,6 +213,11 @@ class ExerciseGenerator:
             ]
         }}
         """
+        
+        # 模板只有一个占位符，预先拆成前后两段，避免每次调用都做format
+        prefix, suffix = self.exercise_template.split("{content}")
+        self._prompt_prefix = prefix.replace("{{", "{").replace("}}", "}")
+        self._prompt_suffix = suffix.replace("{{", "{").replace("}}", "}")
 
     def generate_exercises(self, content: str) -> List[Dict]:
         
@@ -46,130 +229,246 @@ class ExerciseGenerator:
             self.logger.info(f"文档内容长度: {len(content)} 字符")
             self.logger.info(f"文档内容前100个字符: {content[:100]}")
             
-            # 准备提示词
-            prompt = self.exercise_template.format(content=content)
+            # 先查缓存：精确哈希匹配，未命中再做语义相似度匹配
+            content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+            cached = self.cache.get(content_hash)
+            if cached is not None:
+                self.logger.info("命中练习题缓存（内容哈希）")
+                return cached
             
-            # 调用阿里云API
-            self.logger.info("正在调用通义千问API...")
-            response = Generation.call(
-                model=self.model,
-                prompt=prompt,
-                api_key=self.api_key,
-                result_format='message',
-                temperature=0.7,
-                max_tokens=2000,
-                top_p=0.8,
-                top_k=50,
-                enable_search=True
-            )
+            embedding = None
+            if len(content) <= SEMANTIC_CACHE_MAX_CHARS:
+                embedding = self._embed_for_cache(content)
+                cached = self.cache.semantic_lookup(embedding, len(content))
+                if cached is not None:
+                    self.logger.info("命中练习题缓存（语义相似）")
+                    return cached
+            
+            segments = self._split_content(content)
+            if len(segments) == 1:
+                exercises = self._request_exercises(content)
+            else:
+                self.logger.info(f"文档较长，拆分为 {len(segments)} 段并行生成练习题")
+                exercises = self._request_exercises_parallel(segments)
             
-           # self.logger.info(f"API响应状态码: {response.status_code}")
-            #self.logger.info(f"API响应类型: {type(response)}")
+            if exercises:
+                self.cache.store(content_hash, embedding, len(content), exercises)
+            return exercises
             
-            if response.status_code == 200:
-                # 从响应中提取JSON内容
-                self.logger.info(f"Response output type: {type(response.output)}")
-                self.logger.info(f"Response output attributes: {dir(response.output)}")
+        except Exception as e:
+            self.logger.error(f"生成练习题时出错: {str(e)}")
+            return []
+
+    def _request_exercises(self, content: str) -> List[Dict]:
+        """调用一次通义千问生成练习题并校验格式"""
+        # 准备提示词
+        prompt = self._prompt_prefix + content + self._prompt_suffix
+        
+        # 调用阿里云API
+        self.logger.info("正在调用通义千问API...")
+        response = Generation.call(
+            model=self.model,
+            prompt=prompt,
+            api_key=self.api_key,
+            result_format='message',
+            temperature=0.7,
+            max_tokens=2000,
+            top_p=0.8,
+            top_k=50,
+            enable_search=True
+        )
+        
+       # self.logger.info(f"API响应状态码: {response.status_code}")
+        #self.logger.info(f"API响应类型: {type(response)}")
+        
+        if response.status_code == 200:
+            # 从响应中提取JSON内容
+            self.logger.info(f"Response output type: {type(response.output)}")
+            self.logger.info(f"Response output attributes: {dir(response.output)}")
+            
+            # 获取响应文本
+            try:
+                # 打印完整的响应结构以便调试
+                self.logger.info(f"Full response structure: {response.output}")
+                
+                # 尝试获取文本内容
+                if hasattr(response.output, 'choices') and response.output.choices:
+                    response_text = response.output.choices[0].get('message', {}).get('content', '')
+                else:
+                    response_text = str(response.output)
                 
-                # 获取响应文本
+                if not response_text:
+                    self.logger.error("无法从响应中获取文本内容")
+                    return []
+                
+                self.logger.info(f"API响应文本: {response_text[:200]}...")  # 打印前200个字符
+                
+                # 尝试提取JSON部分
                 try:
-                    # 打印完整的响应结构以便调试
-                    self.logger.info(f"Full response structure: {response.output}")
+                    # 查找JSON开始和结束的位置
+                    start_idx = response_text.find('{')
+                    end_idx = response_text.rfind('}') + 1
+                    
+                    if start_idx == -1 or end_idx <= start_idx:
+                        self.logger.error("错误：未找到JSON格式的内容")
+                        return []
                     
-                    # 尝试获取文本内容
-                    if hasattr(response.output, 'choices') and response.output.choices:
-                        response_text = response.output.choices[0].get('message', {}).get('content', '')
-                    else:
-                        response_text = str(response.output)
+                    payload = response_text[start_idx:end_idx].encode("utf-8")
+                    self.logger.info(f"提取的JSON字符串: {response_text[start_idx:start_idx + 200]}...")  # 打印前200个字符
                     
-                    if not response_text:
-                        self.logger.error("无法从响应中获取文本内容")
+                    exercises_data = orjson.loads(payload)
+                    
+                    if not isinstance(exercises_data, dict):
+                        self.logger.error(f"错误：解析后的数据不是字典类型，而是 {type(exercises_data)}")
                         return []
                     
-                    self.logger.info(f"API响应文本: {response_text[:200]}...")  # 打印前200个字符
+                    exercises = exercises_data.get("exercises", [])
+                    
+                    if not exercises:
+                        self.logger.error("错误：生成的练习题列表为空")
+                        return []
                     
-                    # 尝试提取JSON部分
+                    # 验证每个练习题的格式
+                    valid_exercises = []
+                    for i, exercise in enumerate(exercises):
+                        if not isinstance(exercise, dict):
+                            self.logger.error(f"错误：练习题 {i+1} 不是字典类型")
+                            continue
+                            
+                        required_fields = ['question', 'type', 'answer', 'explanation']
+                        if not all(field in exercise for field in required_fields):
+                            self.logger.error(f"错误：练习题 {i+1} 缺少必要字段")
+                            continue
+                            
+                        if exercise['type'] == '选择题' and 'options' not in exercise:
+                            self.logger.error(f"错误：练习题 {i+1} 是选择题但缺少选项")
+                            continue
+                            
+                        valid_exercises.append(exercise)
+                    
+                    if not valid_exercises:
+                        self.logger.error("错误：没有有效的练习题")
+                        return []
+                    
+                    self.logger.info(f"成功生成 {len(valid_exercises)} 道练习题")
+                    return valid_exercises
+                    
+                except orjson.JSONDecodeError as e:
+                    self.logger.error(f"JSON解析失败: {str(e)}")
+                    self.logger.info("尝试清理响应文本...")
+                    # 字符串里可能含有未转义的换行，只清理已截取的JSON部分
                     try:
-                        # 查找JSON开始和结束的位置
-                        start_idx = response_text.find('{')
-                        end_idx = response_text.rfind('}') + 1
-                        
-                        if start_idx == -1 or end_idx == -1:
-                            self.logger.error("错误：未找到JSON格式的内容")
-                            return []
-                        
-                        json_str = response_text[start_idx:end_idx]
-                        self.logger.info(f"提取的JSON字符串: {json_str[:200]}...")  # 打印前200个字符
-                        
-                        exercises_data = json.loads(json_str)
-                        
+                        exercises_data = orjson.loads(payload.replace(b'\n', b' '))
                         if not isinstance(exercises_data, dict):
-                            self.logger.error(f"错误：解析后的数据不是字典类型，而是 {type(exercises_data)}")
+                            self.logger.error(f"错误：清理后解析的数据不是字典类型，而是 {type(exercises_data)}")
                             return []
-                        
+                            
                         exercises = exercises_data.get("exercises", [])
-                        
-                        if not exercises:
-                            self.logger.error("错误：生成的练习题列表为空")
-                            return []
-                        
-                        # 验证每个练习题的格式
-                        valid_exercises = []
-                        for i, exercise in enumerate(exercises):
-                            if not isinstance(exercise, dict):
-                                self.logger.error(f"错误：练习题 {i+1} 不是字典类型")
-                                continue
-                                
-                            required_fields = ['question', 'type', 'answer', 'explanation']
-                            if not all(field in exercise for field in required_fields):
-                                self.logger.error(f"错误：练习题 {i+1} 缺少必要字段")
-                                continue
-                                
-                            if exercise['type'] == '选择题' and 'options' not in exercise:
-                                self.logger.error(f"错误：练习题 {i+1} 是选择题但缺少选项")
-                                continue
-                                
-                            valid_exercises.append(exercise)
-                        
-                        if not valid_exercises:
-                            self.logger.error("错误：没有有效的练习题")
-                            return []
-                        
-                        self.logger.info(f"成功生成 {len(valid_exercises)} 道练习题")
-                        return valid_exercises
-                        
-                    except json.JSONDecodeError as e:
-                        self.logger.error(f"JSON解析失败: {str(e)}")
-                        self.logger.info("尝试清理响应文本...")
-                        # 如果直接解析失败，尝试清理文本
-                        cleaned_text = response_text.replace('\n', ' ').strip()
-                        try:
-                            exercises_data = json.loads(cleaned_text)
-                            if not isinstance(exercises_data, dict):
-                                self.logger.error(f"错误：清理后解析的数据不是字典类型，而是 {type(exercises_data)}")
-                                return []
-                                
-                            exercises = exercises_data.get("exercises", [])
-                            if exercises:
-                                self.logger.info(f"清理后成功解析，生成 {len(exercises)} 道练习题")
-                                return exercises
-                            else:
-                                self.logger.error("清理后解析成功，但练习题列表为空")
-                                return []
-                        except Exception as e:
-                            self.logger.error(f"清理后的文本仍然无法解析为JSON: {str(e)}")
+                        if exercises:
+                            self.logger.info(f"清理后成功解析，生成 {len(exercises)} 道练习题")
+                            return exercises
+                        else:
+                            self.logger.error("清理后解析成功，但练习题列表为空")
                             return []
-                except Exception as e:
-                    self.logger.error(f"无法从响应中获取文本内容: {str(e)}")
-                    return []
-            else:
-                self.logger.error(f"API调用失败: {response.status_code} - {response.message}")
+                    except Exception as e:
+                        self.logger.error(f"清理后的文本仍然无法解析为JSON: {str(e)}")
+                        return []
+            except Exception as e:
+                self.logger.error(f"无法从响应中获取文本内容: {str(e)}")
                 return []
-            
-        except Exception as e:
-            self.logger.error(f"生成练习题时出错: {str(e)}")
+        else:
+            self.logger.error(f"API调用失败: {response.status_code} - {response.message}")
             return []
 
+    def _split_content(self, content: str) -> List[str]:
+        """把长文档切成至多MAX_SEGMENTS段（切点吸附到最近的换行），短文档原样返回"""
+        if len(content) <= SEGMENT_CHARS:
+            return [content]
+        
+        segment_count = min(MAX_SEGMENTS, -(-len(content) // SEGMENT_CHARS))
+        segment_size = -(-len(content) // segment_count)
+        
+        # 切点固定在 i*segment_size 附近，段数因此恰好为segment_count
+        boundaries = [0]
+        for i in range(1, segment_count):
+            target = i * segment_size
+            cut = target
+            window = segment_size // 2
+            before = content.rfind('\n', max(boundaries[-1], target - window), target)
+            after = content.find('\n', target, min(len(content), target + window))
+            if before != -1 and (after == -1 or target - before <= after - target):
+                cut = before + 1
+            elif after != -1:
+                cut = after + 1
+            if boundaries[-1] < cut < len(content):
+                boundaries.append(cut)
+        boundaries.append(len(content))
+        
+        segments = []
+        for start, end in zip(boundaries, boundaries[1:]):
+            segment = content[start:end]
+            if segment.strip():
+                segments.append(segment)
+        return segments
+
+    def _request_exercises_parallel(self, segments: List[str]) -> List[Dict]:
+        """并行为每段内容生成练习题，按段顺序合并并按题目去重"""
+        results: Dict[int, List[Dict]] = {}
+        with ThreadPoolExecutor(max_workers=min(MAX_SEGMENTS, len(segments))) as executor:
+            futures = {
+                executor.submit(self._request_exercises, segment): idx
+                for idx, segment in enumerate(segments)
+            }
+            for future in as_completed(futures):
+                idx = futures[future]
+                try:
+                    results[idx] = future.result()
+                except Exception as e:
+                    self.logger.error(f"第 {idx + 1} 段生成练习题失败: {str(e)}")
+                    results[idx] = []
+        
+        exercises = []
+        seen_questions = set()
+        for idx in range(len(segments)):
+            for exercise in results[idx]:
+                question_key = hashlib.sha256(
+                    str(exercise.get('question', '')).strip().encode("utf-8")
+                ).hexdigest()
+                if question_key in seen_questions:
+                    continue
+                seen_questions.add(question_key)
+                exercises.append(exercise)
+        
+        self.logger.info(f"并行生成共得到 {len(exercises)} 道练习题")
+        return exercises
+
+    def _embed_for_cache(self, content: str) -> Optional[np.ndarray]:
+        """对整篇短文档做向量化并归一化，失败时返回None（仅影响语义缓存）"""
+        try:
+            response = TextEmbedding.call(
+                model=self.embedding_model,
+                input=content,
+                api_key=self.api_key
+            )
+            if response.status_code != 200:
+                self.logger.warning(f"缓存向量化失败: {response.status_code} - {response.message}")
+                return None
+            vector = np.asarray(response.output["embeddings"][0]["embedding"], dtype=np.float32)
+        except Exception as e:
+            self.logger.warning(f"缓存向量化出错: {str(e)}")
+            return None
+        
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return None
+        return vector / norm
+
     def preview_content(self, content: str):
         st.write("文档内容预览：")
-        st.text(content[:500] + "..." if len(content) > 500 else content) 
\ No newline at end of file
+        st.text(content[:500] + "..." if len(content) > 500 else content) 
+
+
+@functools.lru_cache(maxsize=4)
+def get_exercise_generator(dashscope_api_key: str) -> ExerciseGenerator:
+    """按API Key复用练习题生成器，避免重复初始化和重复加载缓存"""
+    return ExerciseGenerator(dashscope_api_key)
@@ -0,0 +1,86 @@
+import os
+import pickle
+from typing import Any
+
+import faiss
+import orjson
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+MMAP_READ_FLAGS = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+
+
+def read_index_mmap(index_path: str):
+    """Open a FAISS index, memory-mapping its inverted lists when it is an IVF index.
+
+    ``IO_FLAG_MMAP`` only applies to IVF inverted lists; flat and SQ8 indexes
+    are still read fully into RAM and stay writable.
+    """
+    return faiss.read_index(index_path, MMAP_READ_FLAGS)
+
+
+def load_local_mmap(folder_path: str, embeddings: Any, index_name: str = "index", **kwargs: Any) -> FAISS:
+    """Load a store written by ``FAISS.save_local`` via ``read_index_mmap``.
+
+    The docstore pickle is one of our own files, same as with
+    ``FAISS.load_local(..., allow_dangerous_deserialization=True)``.
+    For IVF indexes, call ``faiss.read_index`` on the index file again before adding vectors.
+    """
+    index = read_index_mmap(os.path.join(folder_path, f"{index_name}.faiss"))
+    with open(os.path.join(folder_path, f"{index_name}.pkl"), "rb") as file_handle:
+        docstore, index_to_docstore_id = pickle.load(file_handle)
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=index_to_docstore_id,
+        **kwargs,
+    )
+
+
+def save_local_json(vector_store: FAISS, folder_path: str, index_name: str = "index") -> None:
+    """Write the raw FAISS index plus an orjson docstore instead of a pickle."""
+    os.makedirs(folder_path, exist_ok=True)
+    faiss.write_index(vector_store.index, os.path.join(folder_path, f"{index_name}.faiss"))
+
+    index_to_docstore_id = vector_store.index_to_docstore_id
+    doc_ids = [index_to_docstore_id[position] for position in range(len(index_to_docstore_id))]
+    documents = {}
+    for doc_id in doc_ids:
+        document = vector_store.docstore.search(doc_id)
+        documents[doc_id] = {
+            "page_content": document.page_content,
+            "metadata": document.metadata,
+        }
+
+    payload = {"doc_ids": doc_ids, "documents": documents}
+    with open(os.path.join(folder_path, f"{index_name}.json"), "wb") as file_handle:
+        file_handle.write(orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY))
+
+
+def load_local_json(folder_path: str, embeddings: Any, index_name: str = "index", **kwargs: Any) -> FAISS:
+    """Load a store written by ``save_local_json``, memory-mapping the index.
+
+    Stores saved in the older ``FAISS.save_local`` pickle format are still loaded.
+    """
+    json_path = os.path.join(folder_path, f"{index_name}.json")
+    if not os.path.exists(json_path):
+        return load_local_mmap(folder_path, embeddings, index_name=index_name, **kwargs)
+
+    with open(json_path, "rb") as file_handle:
+        payload = orjson.loads(file_handle.read())
+
+    docstore = InMemoryDocstore(
+        {
+            doc_id: Document(page_content=item["page_content"], metadata=item["metadata"])
+            for doc_id, item in payload["documents"].items()
+        }
+    )
+    return FAISS(
+        embedding_function=embeddings,
+        index=read_index_mmap(os.path.join(folder_path, f"{index_name}.faiss")),
+        docstore=docstore,
+        index_to_docstore_id=dict(enumerate(payload["doc_ids"])),
+        **kwargs,
+    )
@@ -1,10 +1,14 @@
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import os
 import json
+import faiss
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
 from langchain_community.embeddings import OpenAIEmbeddings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import TextLoader, PyPDFLoader
+from .embedding_cache import EmbeddingCache
+from .faiss_io import load_local_mmap
 from .smart_splitter import SmartTextSplitter
 
 class KnowledgeBase:
@@ -15,16 +19,19 @@ class KnowledgeBase:
             persist_directory: 向量存储持久化目录
         """
         self.persist_directory = persist_directory
-        self.embeddings = OpenAIEmbeddings()
+        # 每次请求最多提交1024条文本，减少HTTP往返
+        self.embeddings = OpenAIEmbeddings(chunk_size=1024)
+        self.embedding_cache = EmbeddingCache()
         self.vectorstore = None
         self.smart_splitter = SmartTextSplitter()
+        # 内存映射只作用于IVF索引的倒排表，这类只读索引写入前需要完整加载；
+        # 本类创建的平坦/SQ8索引加载时本来就整体读入内存，可以直接写入
+        self._index_is_mapped = False
         
         # 加载已存在的向量存储
         if os.path.exists(persist_directory):
-            self.vectorstore = FAISS.load_local(
-                persist_directory,
-                self.embeddings
-            )
+            self.vectorstore = load_local_mmap(persist_directory, self.embeddings)
+            self._index_is_mapped = faiss.try_extract_index_ivf(self.vectorstore.index) is not None
 
     def add_document(self, file_path: str, question_type: str = "factual") -> Dict:
         """
@@ -59,14 +66,24 @@ class KnowledgeBase:
             # 添加分块到列表
             all_chunks.extend(info["chunks"])
         
+        # 所有文档的分块一次性批量向量化，已缓存的分块不再请求接口
+        vectors = self.embedding_cache.embed_documents(
+            self.embeddings,
+            all_chunks,
+            self.embeddings.model
+        )
+        text_embeddings = list(zip(all_chunks, vectors))
+        
         # 创建新的向量存储或更新现有的
         if self.vectorstore is None:
-            self.vectorstore = FAISS.from_texts(
-                all_chunks,
-                self.embeddings
-            )
+            self.vectorstore = self._create_quantized_vectorstore(text_embeddings)
         else:
-            self.vectorstore.add_texts(all_chunks)
+            if self._index_is_mapped:
+                self.vectorstore.index = faiss.read_index(
+                    os.path.join(self.persist_directory, "index.faiss")
+                )
+                self._index_is_mapped = False
+            self.vectorstore.add_embeddings(text_embeddings)
         
         # 保存向量存储
         self.vectorstore.save_local(self.persist_directory)
@@ -78,6 +95,33 @@ class KnowledgeBase:
             "split_info": split_info
         }
     
+    def _create_quantized_vectorstore(self, text_embeddings: List[Tuple[str, List[float]]]) -> FAISS:
+        """
+        使用半精度（fp16）标量量化索引创建向量存储，每个维度只占2字节
+        Args:
+            text_embeddings: (文本, 向量) 列表
+        Returns:
+            FAISS: 向量存储
+        """
+        dimension = len(text_embeddings[0][1])
+        # 知识库会持续追加文档，8位量化的取值范围无论取自第一批向量（会截断之后的向量）
+        # 还是固定为 [-1, 1]（1536维单位向量各分量只在约 ±0.13 内，只用到约17个量化级）都会损失召回；
+        # fp16 不依赖训练数据的取值范围，召回与精确检索基本一致
+        index = faiss.IndexScalarQuantizer(
+            dimension,
+            faiss.ScalarQuantizer.QT_fp16,
+            faiss.METRIC_L2
+        )
+        
+        vectorstore = FAISS(
+            embedding_function=self.embeddings,
+            index=index,
+            docstore=InMemoryDocstore(),
+            index_to_docstore_id={}
+        )
+        vectorstore.add_embeddings(text_embeddings)
+        return vectorstore
+    
     def search(self, query: str, k: int = 4) -> List[Dict]:
         """
         搜索知识库
@@ -132,6 +176,7 @@ class KnowledgeBase:
             import shutil
             shutil.rmtree(self.persist_directory)
         self.vectorstore = None
+        self._index_is_mapped = False
 
     def _load_knowledge_base_info(self):
         """加载知识库信息"""
@@ -209,7 +254,7 @@ class KnowledgeBase:
             
             # 加载向量存储
             if os.path.exists(kb_path):
-                return FAISS.load_local(kb_path, self.embeddings)
+                return load_local_mmap(kb_path, self.embeddings)
             return None
             
         except Exception as e:
@@ -1,10 +1,35 @@
+import hashlib
 import time
-from typing import Any, Optional
+from typing import Any, Dict, List, Optional
 
+import faiss
+import numpy as np
 import requests
 
 from utils.vector_store import RetrievalStrategy
 
+# Cosine similarity above which a previous answer is reused for a new question.
+# Kept high: the embedding model is English-only, and short Chinese questions that
+# differ in a single term (e.g. 三次握手 / 四次挥手) can still score above 0.9.
+SEMANTIC_CACHE_THRESHOLD = 0.97
+# Nearest cached questions checked for one whose context also matches.
+SEMANTIC_CACHE_CANDIDATES = 8
+
+# Static instructions go first so every request shares the same cacheable prefix;
+# only the retrieved context and the question vary per call.
+QA_SYSTEM_PROMPT = """你是一位经验丰富的学习助手。以下是本次考试的复习资料。请根据这些复习资料回答问题，并给出相关复习建议。
+如果参考信息中没有相关内容，请根据现有知识给出合理回答，并明确说明该信息未在复习资料中找到。"""
+
+QA_USER_TEMPLATE = """参考信息：
+{context}
+
+问题：{question}
+
+回答："""
+
+# Single-string form for the local finetuned model, assembled once at import.
+QA_PROMPT_TEMPLATE = f"{QA_SYSTEM_PROMPT}\n\n{QA_USER_TEMPLATE}"
+
 
 class QAChain:
     def __init__(
@@ -25,6 +50,10 @@ class QAChain:
             "Content-Type": "application/json",
         }
 
+        self._qcache_index = None
+        self._qcache_answers: List[str] = []
+        self._qcache_context_keys: List[str] = []
+
         self.use_finetuned = finetuned_model_path is not None
         if self.use_finetuned:
             import torch
@@ -57,16 +86,57 @@ class QAChain:
         documents = self.vector_store.similarity_search(question, k=5)
         return "\n".join(doc.page_content for doc in documents)
 
-    def _build_prompt(self, question: str, context: str) -> str:
-        return f"""你是一位经验丰富的学习助手。以下是本次考试的复习资料。请根据这些复习资料回答问题，并给出相关复习建议。
-如果参考信息中没有相关内容，请根据现有知识给出合理回答，并明确说明该信息未在复习资料中找到。
-
-参考信息：
-{context}
+    def _build_messages(self, question: str, context: str) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": QA_SYSTEM_PROMPT},
+            {"role": "user", "content": QA_USER_TEMPLATE.format(context=context, question=question)},
+        ]
 
-问题：{question}
+    def _build_prompt(self, question: str, context: str) -> str:
+        return QA_PROMPT_TEMPLATE.format(context=context, question=question)
 
-回答："""
+    def _embed_question(self, question: str) -> Optional[np.ndarray]:
+        embeddings = getattr(self.vector_store, "embeddings", None)
+        if embeddings is None:
+            return None
+        try:
+            query_vector = np.asarray([embeddings.embed_query(question)], dtype=np.float32)
+        except Exception as exc:
+            print(f"Question embedding failed, skipping answer cache: {exc}")
+            return None
+        faiss.normalize_L2(query_vector)
+        return query_vector
+
+    def _context_key(self, context_override: Optional[str]) -> str:
+        # Answers are only reused for the same caller-supplied context, or for the
+        # same retrieval settings when the context comes from our own retrieval.
+        if context_override is None:
+            strategy = getattr(self, "retrieval_strategy", None)
+            strategy_name = strategy.value if strategy is not None else "default"
+            return f"retrieval:{strategy_name}:{self.use_enhanced_retrieval}"
+        return "context:" + hashlib.sha256(context_override.encode("utf-8")).hexdigest()
+
+    def _lookup_cached_answer(self, query_vector: Optional[np.ndarray], context_key: str) -> Optional[str]:
+        if query_vector is None or self._qcache_index is None:
+            return None
+        k = min(SEMANTIC_CACHE_CANDIDATES, self._qcache_index.ntotal)
+        scores, indices = self._qcache_index.search(query_vector, k)
+        for score, idx in zip(scores[0], indices[0]):
+            if idx == -1 or score < SEMANTIC_CACHE_THRESHOLD:
+                break
+            if self._qcache_context_keys[idx] == context_key:
+                print(f"Answer cache hit (similarity {score:.3f})")
+                return self._qcache_answers[idx]
+        return None
+
+    def _cache_answer(self, query_vector: Optional[np.ndarray], context_key: str, answer: str) -> None:
+        if query_vector is None or not answer:
+            return
+        if self._qcache_index is None:
+            self._qcache_index = faiss.IndexFlatIP(query_vector.shape[1])
+        self._qcache_index.add(query_vector)
+        self._qcache_answers.append(answer)
+        self._qcache_context_keys.append(context_key)
 
     def get_answer(self, question: str, context_override: Optional[str] = None) -> str:
         """Get an answer for the provided question."""
@@ -74,14 +144,19 @@ class QAChain:
             print(f"Processing question: {question}")
             start_time = time.time()
 
+            query_vector = self._embed_question(question)
+            context_key = self._context_key(context_override)
+            cached_answer = self._lookup_cached_answer(query_vector, context_key)
+            if cached_answer is not None:
+                return cached_answer
+
             if context_override is not None:
                 context = context_override
             else:
                 strategy = getattr(self, "retrieval_strategy", None)
                 context = self._build_context(question, strategy=strategy)
-            prompt = self._build_prompt(question, context)
-
             if self.use_finetuned:
+                prompt = self._build_prompt(question, context)
                 inputs = self.tokenizer(prompt, return_tensors="pt").to(self.device)
                 outputs = self.model.generate(
                     **inputs,
@@ -96,10 +171,11 @@ class QAChain:
                 )
                 answer = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
                 answer = answer[len(prompt):].strip()
+                self._cache_answer(query_vector, context_key, answer)
             else:
                 payload = {
                     "model": "qwen-turbo",
-                    "input": {"prompt": prompt},
+                    "input": {"messages": self._build_messages(question, context)},
                     "parameters": {
                         "temperature": 0.4,
                         "max_tokens": 800,
@@ -115,7 +191,11 @@ class QAChain:
                 response_data = response.json()
 
                 if response.status_code == 200:
-                    answer = response_data.get("output", {}).get("text", "无法获取回答")
+                    answer = response_data.get("output", {}).get("text")
+                    if answer:
+                        self._cache_answer(query_vector, context_key, answer)
+                    else:
+                        answer = "无法获取回答"
                 else:
                     error_msg = f"API 调用失败: {response.status_code} - {response.text}"
                     print(error_msg)
@@ -1,21 +1,38 @@
-from typing import List, Dict, Optional
+from collections import OrderedDict
+from types import SimpleNamespace
+from typing import List, Dict, Optional, Tuple
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+import hashlib
 import re
-import nltk
-from nltk.tokenize import sent_tokenize
 import numpy as np
 
+# 分块结果缓存条数
+SPLIT_CACHE_SIZE = 128
+
+# 技术术语（可以根据需要扩展）
+_TECH_PATTERN = (
+    r'\b(?:function|class|method|algorithm|protocol|interface'
+    r'|API|SDK|REST|HTTP|TCP|IP'
+    r'|database|server|client|network|security)\b'
+)
+
+# 文本特征扫描：代码块、段落分隔、句子终止符、技术术语合并为一个正则
+_SCAN_RE = re.compile(
+    r'(?P<code>```[\s\S]*?```)'
+    r'|(?P<para>\n\n)'
+    r'|(?P<sent>[.!?。！？]+)'
+    rf'|(?P<tech>{_TECH_PATTERN})',
+    re.IGNORECASE
+)
+_NONBLANK_RE = re.compile(r'\S')
+# 代码块被 _SCAN_RE 整体匹配，块内的技术术语单独再数一遍
+_TECH_RE = re.compile(_TECH_PATTERN, re.IGNORECASE)
+
 class SmartTextSplitter:
     def __init__(self):
         """
         初始化智能分块器
         """
-        # 下载必要的NLTK数据
-        try:
-            nltk.data.find('tokenizers/punkt')
-        except LookupError:
-            nltk.download('punkt')
-        
         # 基础分块器
         self.base_splitter = RecursiveCharacterTextSplitter(
             chunk_size=500,
@@ -23,6 +40,12 @@ class SmartTextSplitter:
             length_function=len,
         )
         
+        # 分块结果LRU缓存：(文本哈希, 问题类型) -> 分析与分块结果
+        self._split_cache: "OrderedDict[Tuple[str, str], Dict]" = OrderedDict()
+        
+        # 按 (chunk_size, chunk_overlap) 复用的分块器
+        self._splitter_cache: Dict[Tuple[int, int], RecursiveCharacterTextSplitter] = {}
+        
         # 问题类型对应的分块策略
         self.question_strategies = {
             "factual": {
@@ -62,69 +85,97 @@ class SmartTextSplitter:
             }
         }
         
-        # 文本特征分析器
-        self.text_analyzers = {
-            "sentence_length": self._analyze_sentence_length,
-            "paragraph_length": self._analyze_paragraph_length,
-            "technical_terms": self._analyze_technical_terms,
-            "code_blocks": self._analyze_code_blocks
-        }
-
-    def _analyze_sentence_length(self, text: str) -> Dict:
-        """分析句子长度特征"""
-        sentences = sent_tokenize(text)
-        lengths = [len(s) for s in sentences]
-        return {
-            "avg_length": np.mean(lengths),
-            "max_length": max(lengths),
-            "min_length": min(lengths),
-            "std_length": np.std(lengths)
-        }
-
-    def _analyze_paragraph_length(self, text: str) -> Dict:
-        """分析段落长度特征"""
-        paragraphs = text.split('\n\n')
-        lengths = [len(p) for p in paragraphs if p.strip()]
+    def _length_stats(self, lengths: List[int]) -> Dict:
+        """一次求和与平方和得到均值、标准差，避免多次归约遍历"""
+        if not lengths:
+            return {
+                "avg_length": 0.0,
+                "max_length": 0,
+                "min_length": 0,
+                "std_length": 0.0
+            }
+        values = np.fromiter(lengths, dtype=np.int64, count=len(lengths))
+        n = values.size
+        mean = values.sum() / n
+        variance = max(float(np.dot(values, values)) / n - mean * mean, 0.0)
         return {
-            "avg_length": np.mean(lengths),
-            "max_length": max(lengths),
-            "min_length": min(lengths),
-            "std_length": np.std(lengths)
+            "avg_length": mean,
+            "max_length": int(values.max()),
+            "min_length": int(values.min()),
+            "std_length": float(np.sqrt(variance))
         }
 
-    def _analyze_technical_terms(self, text: str) -> Dict:
-        """分析技术术语密度"""
-        # 简单的技术术语检测（可以根据需要扩展）
-        technical_patterns = [
-            r'\b(?:function|class|method|algorithm|protocol|interface)\b',
-            r'\b(?:API|SDK|REST|HTTP|TCP|IP)\b',
-            r'\b(?:database|server|client|network|security)\b'
-        ]
-        
-        matches = sum(len(re.findall(pattern, text, re.IGNORECASE)) 
-                     for pattern in technical_patterns)
-        total_words = len(text.split())
-        
-        return {
-            "technical_density": matches / total_words if total_words > 0 else 0,
-            "total_terms": matches
-        }
+    def _analyze_sentence_length(self, lengths: List[int]) -> Dict:
+        """汇总句子长度特征"""
+        return self._length_stats(lengths)
 
-    def _analyze_code_blocks(self, text: str) -> Dict:
-        """分析代码块特征"""
-        code_blocks = re.findall(r'```[\s\S]*?```', text)
-        return {
-            "has_code": len(code_blocks) > 0,
-            "code_blocks_count": len(code_blocks),
-            "code_ratio": sum(len(block) for block in code_blocks) / len(text) if text else 0
-        }
+    def _analyze_paragraph_length(self, lengths: List[int]) -> Dict:
+        """汇总段落长度特征"""
+        return self._length_stats(lengths)
 
     def analyze_text(self, text: str) -> Dict:
         """分析文本特征"""
-        features = {}
-        for analyzer_name, analyzer_func in self.text_analyzers.items():
-            features[analyzer_name] = analyzer_func(text)
-        return features
+        return self._scan_text(text).features
+
+    def _scan_text(self, text: str) -> SimpleNamespace:
+        """
+        只用一个合并正则扫描一遍文本，同时统计句子、段落、技术术语和代码块
+        （代码块整体匹配，其内部的标点和换行不计入句子与段落）
+        Returns:
+            SimpleNamespace: features为特征字典，code_spans为代码块的 (起, 止) 位置，
+            paragraph_spans为按 \n\n 切出的各段落 (起, 止) 位置（含空段，与 str.split 一致），供分块复用
+        """
+        code_spans = []
+        paragraph_spans = []
+        sentence_lengths = []
+        paragraph_lengths = []
+        technical_terms = 0
+        code_blocks_count = 0
+        code_length = 0
+        sentence_start = 0
+        paragraph_start = 0
+        
+        for match in _SCAN_RE.finditer(text):
+            kind = match.lastgroup
+            if kind == "sent":
+                if match.start() > sentence_start:
+                    sentence_lengths.append(match.end() - sentence_start)
+                sentence_start = match.end()
+            elif kind == "tech":
+                technical_terms += 1
+            elif kind == "para":
+                paragraph_spans.append((paragraph_start, match.start()))
+                if _NONBLANK_RE.search(text, paragraph_start, match.start()):
+                    paragraph_lengths.append(match.start() - paragraph_start)
+                paragraph_start = match.end()
+            else:
+                code_spans.append(match.span())
+                technical_terms += sum(1 for _ in _TECH_RE.finditer(text, *match.span()))
+                code_blocks_count += 1
+                code_length += match.end() - match.start()
+        
+        # 结尾没有终止符的残句和最后一个段落
+        if len(text) > sentence_start:
+            sentence_lengths.append(len(text) - sentence_start)
+        paragraph_spans.append((paragraph_start, len(text)))
+        if _NONBLANK_RE.search(text, paragraph_start):
+            paragraph_lengths.append(len(text) - paragraph_start)
+        
+        total_words = len(text.split())
+        features = {
+            "sentence_length": self._analyze_sentence_length(sentence_lengths),
+            "paragraph_length": self._analyze_paragraph_length(paragraph_lengths),
+            "technical_terms": {
+                "technical_density": technical_terms / total_words if total_words > 0 else 0,
+                "total_terms": technical_terms
+            },
+            "code_blocks": {
+                "has_code": code_blocks_count > 0,
+                "code_blocks_count": code_blocks_count,
+                "code_ratio": code_length / len(text) if text else 0
+            }
+        }
+        return SimpleNamespace(features=features, code_spans=code_spans, paragraph_spans=paragraph_spans)
 
     def adjust_strategy(self, strategy: Dict, text_features: Dict) -> Dict:
         """根据文本特征调整分块策略"""
@@ -158,15 +209,21 @@ class SmartTextSplitter:
         
         return adjusted_strategy
 
-    def split_text(self, text: str, question_type: str = "factual") -> List[str]:
+    def _split_with_info(self, text: str, question_type: str) -> Dict:
         """
-        智能分块文本
+        分析、调整策略并分块，结果按 (文本哈希, 问题类型) 做LRU缓存
         Args:
             text: 要分块的文本
             question_type: 问题类型
         Returns:
-            List[str]: 分块后的文本列表
+            Dict: 原始策略、调整后策略、文本特征和分块元组
         """
+        cache_key = (hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest(), question_type)
+        cached = self._split_cache.get(cache_key)
+        if cached is not None:
+            self._split_cache.move_to_end(cache_key)
+            return cached
+        
         # 获取基础策略
         strategy = self.question_strategies.get(
             question_type,
@@ -174,49 +231,93 @@ class SmartTextSplitter:
         )
         
         # 分析文本特征
-        text_features = self.analyze_text(text)
+        scan = self._scan_text(text)
+        text_features = scan.features
         
         # 调整策略
         adjusted_strategy = self.adjust_strategy(strategy, text_features)
         
-        # 创建分块器
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=adjusted_strategy["chunk_size"],
-            chunk_overlap=adjusted_strategy["chunk_overlap"],
-            length_function=len,
-        )
-        
+        result = {
+            "original_strategy": strategy,
+            "adjusted_strategy": adjusted_strategy,
+            "text_features": text_features,
+            "chunks": tuple(self._split_with_strategy(text, adjusted_strategy, scan))
+        }
+        self._split_cache[cache_key] = result
+        if len(self._split_cache) > SPLIT_CACHE_SIZE:
+            self._split_cache.popitem(last=False)
+        return result
+
+    def split_text(self, text: str, question_type: str = "factual") -> List[str]:
+        """
+        智能分块文本
+        Args:
+            text: 要分块的文本
+            question_type: 问题类型
+        Returns:
+            List[str]: 分块后的文本列表
+        """
+        return list(self._split_with_info(text, question_type)["chunks"])
+
+    def _get_splitter(self, chunk_size: float, chunk_overlap: float) -> RecursiveCharacterTextSplitter:
+        """获取（必要时创建）对应参数的分块器"""
+        key = (int(chunk_size), int(chunk_overlap))
+        splitter = self._splitter_cache.get(key)
+        if splitter is None:
+            splitter = RecursiveCharacterTextSplitter(
+                chunk_size=key[0],
+                chunk_overlap=key[1],
+                length_function=len,
+            )
+            self._splitter_cache[key] = splitter
+        return splitter
+
+    def _split_with_strategy(self, text: str, adjusted_strategy: Dict, scan: SimpleNamespace) -> List[str]:
+        """按调整后的策略分块，复用特征扫描阶段得到的位置信息"""
         # 根据策略选择分块方式
         if adjusted_strategy["split_by"] == "sentence":
             # 按句子分块
+            splitter = self._get_splitter(
+                adjusted_strategy["chunk_size"],
+                adjusted_strategy["chunk_overlap"]
+            )
             chunks = splitter.split_text(text)
         elif adjusted_strategy["split_by"] == "paragraph":
-            # 按段落分块
-            paragraphs = text.split('\n\n')
+            # 按段落分块（没有代码块时扫描记录的段落位置与 text.split('\n\n') 一致）
+            # 相邻段落在原文中连续，只记录当前块的起止位置，输出时切片一次，等价于 '\n\n'.join
             chunks = []
-            current_chunk = []
+            chunk_start = None
+            chunk_end = 0
             current_length = 0
             
-            for para in paragraphs:
-                if current_length + len(para) > adjusted_strategy["chunk_size"]:
-                    if current_chunk:
-                        chunks.append('\n\n'.join(current_chunk))
-                    current_chunk = [para]
-                    current_length = len(para)
+            for start, end in scan.paragraph_spans:
+                if current_length + (end - start) > adjusted_strategy["chunk_size"]:
+                    if chunk_start is not None:
+                        chunks.append(text[chunk_start:chunk_end])
+                    chunk_start = start
+                    current_length = end - start
                 else:
-                    current_chunk.append(para)
-                    current_length += len(para)
+                    if chunk_start is None:
+                        chunk_start = start
+                    current_length += end - start
+                chunk_end = end
             
-            if current_chunk:
-                chunks.append('\n\n'.join(current_chunk))
+            if chunk_start is not None:
+                chunks.append(text[chunk_start:chunk_end])
         elif adjusted_strategy["split_by"] == "code":
             # 特殊处理代码块
             chunks = []
             current_chunk = []
             current_length = 0
             
-            # 分割文本，保持代码块完整
-            parts = re.split(r'(```[\s\S]*?```)', text)
+            # 分割文本，保持代码块完整（直接用扫描得到的代码块位置，不再重新匹配）
+            parts = []
+            last_end = 0
+            for start, end in scan.code_spans:
+                parts.append(text[last_end:start])
+                parts.append(text[start:end])
+                last_end = end
+            parts.append(text[last_end:])
             
             for part in parts:
                 if part.startswith('```'):
@@ -251,26 +352,15 @@ class SmartTextSplitter:
         Returns:
             Dict: 分块信息
         """
-        # 分析文本特征
-        text_features = self.analyze_text(text)
-        
-        # 获取基础策略
-        strategy = self.question_strategies.get(
-            question_type,
-            self.question_strategies["factual"]
-        )
-        
-        # 调整策略
-        adjusted_strategy = self.adjust_strategy(strategy, text_features)
-        
-        # 执行分块
-        chunks = self.split_text(text, question_type)
+        # 特征分析和分块只做一次，且相同文本直接复用缓存
+        result = self._split_with_info(text, question_type)
+        chunks = list(result["chunks"])
         
         return {
-            "original_strategy": strategy,
-            "adjusted_strategy": adjusted_strategy,
-            "text_features": text_features,
+            "original_strategy": result["original_strategy"],
+            "adjusted_strategy": result["adjusted_strategy"],
+            "text_features": result["text_features"],
             "chunks_count": len(chunks),
             "avg_chunk_size": np.mean([len(chunk) for chunk in chunks]) if chunks else 0,
             "chunks": chunks
-        } 
\ No newline at end of file
+        }
@@ -1,12 +1,21 @@
 from enum import Enum
 from typing import Any, Dict, List, Optional
+import math
 import os
+import threading
 import time
 
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
 from sklearn.metrics.pairwise import cosine_similarity
 
+from utils.embedding_cache import EmbeddingCache
+from utils.faiss_io import load_local_json, save_local_json
+
 
 class RetrievalStrategy(Enum):
     PRECISE = "precise"
@@ -37,6 +46,69 @@ _STRATEGY_DEFAULTS = {
 }
 
 
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Below this many vectors a full scan is as fast as IVF and needs no coarse quantizer.
+IVF_MIN_VECTORS = 4096
+IVF_NPROBE = 8
+# k-means wants at least this many training points per centroid; below it FAISS warns and
+# the coarse quantizer is poorly trained.
+IVF_MIN_POINTS_PER_LIST = 39
+
+# One SentenceTransformer per process: the weights are read-only and take seconds to load.
+_EMBEDDINGS: Optional[HuggingFaceEmbeddings] = None
+_EMBEDDINGS_LOCK = threading.Lock()
+
+
+def _select_embedding_device() -> str:
+    try:
+        import torch
+    except ImportError:
+        return "cpu"
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def _get_or_create_embeddings() -> HuggingFaceEmbeddings:
+    global _EMBEDDINGS
+    if _EMBEDDINGS is not None:
+        return _EMBEDDINGS
+    with _EMBEDDINGS_LOCK:
+        if _EMBEDDINGS is None:
+            device = _select_embedding_device()
+            embeddings = HuggingFaceEmbeddings(
+                model_name=EMBEDDING_MODEL_NAME,
+                model_kwargs={"device": device},
+                encode_kwargs={
+                    "normalize_embeddings": True,
+                    "batch_size": 256 if device == "cuda" else 64,
+                },
+            )
+            if device == "cuda":
+                # fp16 halves memory traffic and runs on tensor cores.
+                embeddings.client.half()
+            _EMBEDDINGS = embeddings
+    return _EMBEDDINGS
+
+
+def _build_faiss_index(vectors: np.ndarray):
+    """SQ8 inner-product index over L2-normalized vectors (cosine similarity without the sqrt).
+
+    8-bit scalar quantization stores 1 byte per dimension, a quarter of the
+    FP32 footprint and DRAM traffic per distance evaluation.
+    """
+    num_vectors, dim = vectors.shape
+    if num_vectors < IVF_MIN_VECTORS:
+        index = faiss.index_factory(dim, "SQ8", faiss.METRIC_INNER_PRODUCT)
+        index.train(vectors)
+        return index
+
+    nlist = min(int(4 * math.sqrt(num_vectors)), num_vectors // IVF_MIN_POINTS_PER_LIST)
+    index = faiss.index_factory(dim, f"IVF{nlist},SQ8", faiss.METRIC_INNER_PRODUCT)
+    index.train(vectors)
+    faiss.extract_index_ivf(index).nprobe = IVF_NPROBE
+    return index
+
+
 class VectorStoreManager:
     def __init__(
         self,
@@ -44,11 +116,9 @@ class VectorStoreManager:
         default_strategy: RetrievalStrategy = RetrievalStrategy.BALANCED,
     ):
         os.environ["HUGGINGFACEHUB_API_TOKEN"] = huggingface_api_key
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2",
-            model_kwargs={"device": "cpu"},
-            encode_kwargs={"normalize_embeddings": True},
-        )
+        self.embedding_model_name = EMBEDDING_MODEL_NAME
+        self.embeddings = _get_or_create_embeddings()
+        self.embedding_cache = EmbeddingCache()
         self.vector_store = None
         self.total_documents = 0
         self.default_strategy = default_strategy
@@ -60,7 +130,22 @@ class VectorStoreManager:
             print("Creating vector store...")
             start_time = time.time()
 
-            self.vector_store = FAISS.from_documents(documents, self.embeddings)
+            texts = [doc.page_content for doc in documents]
+            metadatas = [doc.metadata for doc in documents]
+            vectors = self.embedding_cache.embed_documents(
+                self.embeddings,
+                texts,
+                self.embedding_model_name,
+            )
+            matrix = np.ascontiguousarray(vectors, dtype=np.float32)
+            self.vector_store = FAISS(
+                embedding_function=self.embeddings,
+                index=_build_faiss_index(matrix),
+                docstore=InMemoryDocstore(),
+                index_to_docstore_id={},
+                distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT,
+            )
+            self.vector_store.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas)
             self.total_documents = len(documents)
             self.save_vector_store(store_name)
 
@@ -75,7 +160,7 @@ class VectorStoreManager:
         if self.vector_store:
             try:
                 os.makedirs("vector_stores", exist_ok=True)
-                self.vector_store.save_local(f"vector_stores/{store_name}")
+                save_local_json(self.vector_store, f"vector_stores/{store_name}")
             except Exception as e:
                 print(f"Failed to save vector store: {str(e)}")
                 raise
@@ -83,17 +168,30 @@ class VectorStoreManager:
     def load_vector_store(self, store_name: str):
         if os.path.exists(f"vector_stores/{store_name}"):
             try:
-                self.vector_store = FAISS.load_local(
+                # The index is only searched after loading, so map it read-only.
+                self.vector_store = load_local_json(
                     f"vector_stores/{store_name}",
                     self.embeddings,
-                    allow_dangerous_deserialization=True,
+                    distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT,
                 )
+                self.total_documents = self.vector_store.index.ntotal
+                self._warm_up_index()
                 return True
             except Exception as e:
                 print(f"Failed to load vector store: {str(e)}")
                 return False
         return False
 
+    def _warm_up_index(self):
+        # Run one throwaway search so the first user query does not pay for
+        # BLAS/SIMD dispatch setup and the initial page faults on the mapped index.
+        index = self.vector_store.index
+        ivf_index = faiss.try_extract_index_ivf(index)
+        if ivf_index is not None:
+            ivf_index.nprobe = IVF_NPROBE
+        if index.ntotal:
+            index.search(np.zeros((1, index.d), dtype=np.float32), 1)
+
     def similarity_search(self, query: str, k: int = 4) -> List[str]:
         if self.vector_store:
             try:
@@ -103,6 +201,32 @@ class VectorStoreManager:
                 return []
         return []
 
+    def similarity_search_batch(self, queries: List[str], k: int = 4) -> List[List[Any]]:
+        """Search several queries with one encode call and one index.search call."""
+        if not self.vector_store or not queries:
+            return [[] for _ in queries]
+
+        try:
+            query_vectors = np.ascontiguousarray(
+                self.embeddings.embed_documents(queries),
+                dtype=np.float32,
+            )
+            _, indices = self.vector_store.index.search(query_vectors, k)
+
+            results = []
+            for row in indices:
+                documents = []
+                for index in row:
+                    if index == -1:
+                        continue
+                    doc_id = self.vector_store.index_to_docstore_id[int(index)]
+                    documents.append(self.vector_store.docstore.search(doc_id))
+                results.append(documents)
+            return results
+        except Exception as e:
+            print(f"Batch similarity search failed: {str(e)}")
+            return [[] for _ in queries]
+
     def enhanced_similarity_search(
         self,
         query: str,